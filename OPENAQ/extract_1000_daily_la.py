@@ -2,15 +2,35 @@
 Extrai 1000 pontos de MÉDIAS DIÁRIAS de NO₂ e O₃ de Los Angeles
 """
 
-import requests
+import asyncio
+import contextlib
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import time
-
-
-def extract_daily_measurements_from_sensor(
-    api_key: str, sensor_id: int, parameter_name: str, target_points: int = 1000
+from typing import Optional
+
+import aiohttp
+
+from openaq_api import (
+    MAX_CONCURRENCY,
+    OPENAQ_BASE_URL,
+    RateLimiter,
+    create_session,
+    extract_sensors,
+    fetch_records,
+    finalize_frame,
+)
+
+
+async def extract_daily_measurements_from_sensor(
+    api_key: str,
+    sensor_id: int,
+    parameter_name: str,
+    target_points: int = 1000,
+    session: Optional[aiohttp.ClientSession] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    limiter: Optional[RateLimiter] = None,
 ) -> pd.DataFrame:
     """
     Extrai médias diárias de um sensor específico
@@ -20,98 +40,53 @@ def extract_daily_measurements_from_sensor(
         sensor_id: ID do sensor
         parameter_name: Nome do parâmetro (no2, o3)
         target_points: Número alvo de pontos
+        session: Sessão HTTP compartilhada (cria uma própria se omitida)
+        semaphore: Semáforo compartilhado entre sensores (cria um próprio se omitido)
+        limiter: Rate limiter compartilhado da API key (cria um próprio se omitido)
 
     Returns:
         DataFrame com date e valor médio diário
     """
     print(f"\n📊 Extraindo {parameter_name.upper()} DIÁRIO (Sensor {sensor_id})...")
 
-    session = requests.Session()
-    session.headers.update({"X-API-Key": api_key, "Accept": "application/json"})
-
-    all_measurements = []
-    page = 1
+    url = f"{OPENAQ_BASE_URL}/sensors/{sensor_id}/days"
 
     # Período: últimos ~3 anos para ter 1000 dias
-    end_date = datetime.utcnow()
+    # Janela fechada na meia-noite UTC: mantém os params (e a chave do cache) estáveis ao longo do dia
+    end_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     start_date = end_date - timedelta(days=1100)  # margem de segurança
 
-    try:
-        while len(all_measurements) < target_points:
-            params = {
-                "datetime_from": start_date.isoformat() + "Z",
-                "datetime_to": end_date.isoformat() + "Z",
-                "limit": 1000,
-                "page": page,
-            }
-
-            # Usar endpoint /days para médias diárias
-            response = session.get(f"https://api.openaq.org/v3/sensors/{sensor_id}/days", params=params, timeout=30)
-            response.raise_for_status()
-            data = response.json()
-
-            results = data.get("results", [])
-
-            if not results:
-                print(f"   Sem mais dados (página {page})")
-                break
-
-            # Processar resultados
-            for record in results:
-                try:
-                    # Timestamp está em period.datetimeFrom.utc
-                    period = record.get("period", {})
-                    datetime_from = period.get("datetimeFrom", {})
-                    timestamp_str = datetime_from.get("utc")
-
-                    if not timestamp_str:
-                        continue
-
-                    # Para médias diárias, usar apenas a data
-                    timestamp = pd.to_datetime(timestamp_str).date()
-
-                    # Valor é a média diária
-                    value = record.get("value")
-                    unit = record.get("parameter", {}).get("units", "unknown")
-
-                    if value is not None:
-                        # Converter para μg/m³ se necessário
-                        if unit.lower() == "ppm":
-                            if parameter_name.lower() == "no2":
-                                value = value * 1880  # NO₂: 1 ppm = 1880 μg/m³
-                            elif parameter_name.lower() == "o3":
-                                value = value * 1960  # O₃: 1 ppm = 1960 μg/m³
-
-                        all_measurements.append({"date": timestamp, "value": value})
-
-                except Exception:
-                    continue
-
-            print(f"   Página {page}: +{len(results)} dias (total: {len(all_measurements)})")
-
-            if len(all_measurements) >= target_points:
-                break
+    params = {
+        "datetime_from": start_date.isoformat() + "Z",
+        "datetime_to": end_date.isoformat() + "Z",
+    }
 
-            page += 1
+    semaphore = semaphore or asyncio.Semaphore(MAX_CONCURRENCY)
+    limiter = limiter or RateLimiter()
 
-            if page > 50:
-                print(f"   ⚠️  Limite de páginas atingido")
-                break
-
-            time.sleep(0.5)
-
-        # Criar DataFrame
-        df = pd.DataFrame(all_measurements)
+    try:
+        async with contextlib.nullcontext(session) if session else create_session() as session:
+            ts_strs, vals = await fetch_records(
+                session,
+                api_key,
+                url,
+                params,
+                limit=1000,
+                target_points=target_points,
+                parameter_name=parameter_name,
+                semaphore=semaphore,
+                limiter=limiter,
+                label="dias",
+            )
+
+        # Conversão vetorizada dos timestamps; para médias diárias, usar apenas a data
+        ts = pd.to_datetime(ts_strs, utc=True, format="ISO8601").tz_localize(None).normalize()
+
+        df = finalize_frame(pd.DataFrame({"date": ts, "value": vals}), "date", target_points)
 
         if len(df) > 0:
-            df = df.sort_values("date").reset_index(drop=True)
-
-            # Limitar ao número alvo
-            if len(df) > target_points:
-                df = df.tail(target_points).reset_index(drop=True)
-
             print(f"   ✅ Total extraído: {len(df)} dias")
-            print(f"   Período: {df['date'].min()} a {df['date'].max()}")
+            print(f"   Período: {df['date'].min().date()} a {df['date'].max().date()}")
         else:
             print(f"   ⚠️  Nenhum dado extraído")
 
@@ -122,16 +97,19 @@ def extract_daily_measurements_from_sensor(
         return pd.DataFrame(columns=["date", "value"])
 
 
-def extract_1000_daily_points_los_angeles(api_key: str, output_csv: str = "la_air_quality_1000days.csv") -> str:
+def extract_1000_daily_points_los_angeles(
+    api_key: str, output_path: str = "la_air_quality_1000days.parquet", export_csv: bool = False
+) -> str:
     """
     Extrai 1000 pontos de MÉDIAS DIÁRIAS de NO₂ e O₃ de Los Angeles
 
     Args:
         api_key: API key OpenAQ
-        output_csv: Caminho do CSV de saída
+        output_path: Caminho do Parquet de saída
+        export_csv: Também salvar uma cópia CSV (mesmo nome, extensão .csv)
 
     Returns:
-        Caminho do CSV gerado
+        Caminho do Parquet gerado
     """
     print("=" * 80)
     print("🌆 EXTRAÇÃO DE 1000 MÉDIAS DIÁRIAS - LOS ANGELES")
@@ -153,16 +131,18 @@ def extract_1000_daily_points_los_angeles(api_key: str, output_csv: str = "la_ai
     print("📥 EXTRAINDO MÉDIAS DIÁRIAS")
     print("=" * 80)
 
-    # NO₂
-    df_no2 = extract_daily_measurements_from_sensor(
-        api_key=api_key, sensor_id=NO2_SENSOR, parameter_name="no2", target_points=1000
+    df_no2, df_o3 = asyncio.run(
+        extract_sensors(
+            extract_daily_measurements_from_sensor,
+            api_key=api_key,
+            sensors=[(NO2_SENSOR, "no2", 1000), (O3_SENSOR, "o3", 1000)],
+        )
     )
+
+    # NO₂
     df_no2 = df_no2.rename(columns={"value": "no2_ug_m3"})
 
     # O₃
-    df_o3 = extract_daily_measurements_from_sensor(
-        api_key=api_key, sensor_id=O3_SENSOR, parameter_name="o3", target_points=1000
-    )
     df_o3 = df_o3.rename(columns={"value": "o3_ug_m3"})
 
     # ========================================================================
@@ -172,27 +152,24 @@ def extract_1000_daily_points_los_angeles(api_key: str, output_csv: str = "la_ai
     print("🔗 COMBINANDO DADOS")
     print("=" * 80)
 
-    # Criar união de todas as datas
-    all_dates = set()
-
-    if len(df_no2) > 0:
-        all_dates.update(df_no2["date"].tolist())
-    if len(df_o3) > 0:
-        all_dates.update(df_o3["date"].tolist())
+    # Séries indexadas por data (vazias se o sensor não retornou dados)
+    no2 = df_no2.set_index("date")["no2_ug_m3"]
+    o3 = df_o3.set_index("date")["o3_ug_m3"]
 
-    # Criar DataFrame base
-    df_combined = pd.DataFrame({"date": sorted(list(all_dates))})
+    # Médias diárias são contínuas: eixo completo de datas via date_range,
+    # alinhado por reindex em vez de união de conjuntos + merges
+    series = [s for s in (no2, o3) if len(s) > 0]
 
-    # Merge dados
-    if len(df_no2) > 0:
-        df_combined = df_combined.merge(df_no2, on="date", how="left")
+    if series:
+        start = min(s.index.min() for s in series)
+        end = max(s.index.max() for s in series)
+        all_dates = pd.date_range(start, end, freq="D", name="date")
     else:
-        df_combined["no2_ug_m3"] = np.nan
+        all_dates = pd.DatetimeIndex([], name="date")
 
-    if len(df_o3) > 0:
-        df_combined = df_combined.merge(df_o3, on="date", how="left")
-    else:
-        df_combined["o3_ug_m3"] = np.nan
+    df_combined = (
+        pd.concat([no2.reindex(all_dates), o3.reindex(all_dates)], axis=1).astype(np.float32).reset_index()
+    )
 
     # Limitar a 1000 pontos (pegar os mais recentes)
     if len(df_combined) > 1000:
@@ -204,7 +181,7 @@ def extract_1000_daily_points_los_angeles(api_key: str, output_csv: str = "la_ai
     print(f"   O₃: {df_combined['o3_ug_m3'].notna().sum()} dias")
 
     if len(df_combined) > 0:
-        print(f"   Período: {df_combined['date'].min()} a {df_combined['date'].max()}")
+        print(f"   Período: {df_combined['date'].min().date()} a {df_combined['date'].max().date()}")
 
         # Calcular duração em anos
         duration_days = (df_combined["date"].max() - df_combined["date"].min()).days
@@ -212,15 +189,22 @@ def extract_1000_daily_points_los_angeles(api_key: str, output_csv: str = "la_ai
         print(f"   Duração: {duration_days} dias (~{duration_years:.1f} anos)")
 
     # ========================================================================
-    # SALVAR CSV
+    # SALVAR PARQUET
     # ========================================================================
     print(f"\n{'=' * 80}")
-    print("💾 SALVANDO CSV")
+    print("💾 SALVANDO PARQUET")
     print("=" * 80)
 
-    df_combined.to_csv(output_csv, index=False)
+    # Binário + zstd: arquivo menor e leitura sem parsing, preservando os dtypes
+    df_combined.to_parquet(output_path, engine="pyarrow", compression="zstd", index=False)
+
+    print(f"\n✅ Parquet salvo: {output_path}")
+
+    if export_csv:
+        csv_path = os.path.splitext(output_path)[0] + ".csv"
+        df_combined.to_csv(csv_path, index=False)
+        print(f"✅ CSV salvo: {csv_path}")
 
-    print(f"\n✅ CSV salvo: {output_csv}")
     print(f"   Linhas: {len(df_combined)}")
     print(f"   Colunas: date, no2_ug_m3, o3_ug_m3")
 
@@ -243,12 +227,12 @@ def extract_1000_daily_points_los_angeles(api_key: str, output_csv: str = "la_ai
     print("✅ EXTRAÇÃO CONCLUÍDA!")
     print("=" * 80)
 
-    return output_csv
+    return output_path
 
 
 if __name__ == "__main__":
     # Executar
-    import os
+    import sys
 
     API_KEY = os.getenv("OPENAQ_API_KEY", "")
 
@@ -256,13 +240,16 @@ if __name__ == "__main__":
         print("❌ OPENAQ_API_KEY não configurada nas variáveis de ambiente")
         exit(1)
 
-    csv_path = extract_1000_daily_points_los_angeles(api_key=API_KEY, output_csv="la_air_quality_1000days.csv")
+    # --csv: também exporta o CSV legado
+    output_path = extract_1000_daily_points_los_angeles(
+        api_key=API_KEY, output_path="la_air_quality_1000days.parquet", export_csv="--csv" in sys.argv
+    )
 
-    print(f"\n📁 Arquivo gerado: {csv_path}")
+    print(f"\n📁 Arquivo gerado: {output_path}")
 
     # Mostrar primeiras e últimas linhas
     print(f"\n📋 PREVIEW:")
-    df = pd.read_csv(csv_path)
+    df = pd.read_parquet(output_path)
     print("\nPrimeiros 5 dias:")
     print(df.head(5))
     print("\nÚltimos 5 dias:")
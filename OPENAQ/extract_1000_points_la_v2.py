@@ -4,15 +4,35 @@ Para NO₂, O₃ e HCHO
 Versão 2: Usa sensor_ids diretos
 """
 
-import requests
+import asyncio
+import contextlib
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import time
-
-
-def extract_measurements_from_sensor(
-    api_key: str, sensor_id: int, parameter_name: str, target_points: int = 10000
+from typing import Optional
+
+import aiohttp
+
+from openaq_api import (
+    MAX_CONCURRENCY,
+    OPENAQ_BASE_URL,
+    RateLimiter,
+    create_session,
+    extract_sensors,
+    fetch_records,
+    finalize_frame,
+)
+
+
+async def extract_measurements_from_sensor(
+    api_key: str,
+    sensor_id: int,
+    parameter_name: str,
+    target_points: int = 10000,
+    session: Optional[aiohttp.ClientSession] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    limiter: Optional[RateLimiter] = None,
 ) -> pd.DataFrame:
     """
     Extrai medições de um sensor específico
@@ -22,96 +42,52 @@ def extract_measurements_from_sensor(
         sensor_id: ID do sensor
         parameter_name: Nome do parâmetro (no2, o3, hcho)
         target_points: Número alvo de pontos
+        session: Sessão HTTP compartilhada (cria uma própria se omitida)
+        semaphore: Semáforo compartilhado entre sensores (cria um próprio se omitido)
+        limiter: Rate limiter compartilhado da API key (cria um próprio se omitido)
 
     Returns:
         DataFrame com timestamp e valor
     """
     print(f"\n📊 Extraindo {parameter_name.upper()} (Sensor {sensor_id})...")
 
-    session = requests.Session()
-    session.headers.update({"X-API-Key": api_key, "Accept": "application/json"})
-
-    all_measurements = []
-    page = 1
+    url = f"{OPENAQ_BASE_URL}/sensors/{sensor_id}/measurements"
 
     # Período: últimos 2 anos
-    end_date = datetime.utcnow()
+    # Janela fechada na hora cheia UTC: params (e a chave do cache) estáveis entre reexecuções
+    # na mesma hora, sem perder as medições mais recentes
+    end_date = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
     start_date = end_date - timedelta(days=730)
 
-    try:
-        while len(all_measurements) < target_points:
-            params = {
-                "datetime_from": start_date.isoformat() + "Z",
-                "datetime_to": end_date.isoformat() + "Z",
-                "limit": 10000,
-                "page": page,
-            }
-
-            response = session.get(
-                f"https://api.openaq.org/v3/sensors/{sensor_id}/measurements", params=params, timeout=30
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            results = data.get("results", [])
-
-            if not results:
-                print(f"   Sem mais dados (página {page})")
-                break
-
-            # Processar resultados
-            for record in results:
-                try:
-                    # Timestamp está em period.datetimeFrom.utc
-                    period = record.get("period", {})
-                    datetime_from = period.get("datetimeFrom", {})
-                    timestamp_str = datetime_from.get("utc")
-
-                    if not timestamp_str:
-                        continue
+    params = {
+        "datetime_from": start_date.isoformat() + "Z",
+        "datetime_to": end_date.isoformat() + "Z",
+    }
 
-                    timestamp = pd.to_datetime(timestamp_str)
-                    value = record.get("value")
-                    unit = record.get("parameter", {}).get("units", "unknown")
+    semaphore = semaphore or asyncio.Semaphore(MAX_CONCURRENCY)
+    limiter = limiter or RateLimiter()
 
-                    if value is not None:
-                        # Converter para μg/m³ se necessário
-                        if unit.lower() == "ppm":
-                            if parameter_name.lower() == "no2":
-                                value = value * 1880
-                            elif parameter_name.lower() == "o3":
-                                value = value * 1960
-                            elif parameter_name.lower() == "hcho":
-                                value = value * 1230
-
-                        all_measurements.append({"timestamp": timestamp, "value": value})
-
-                except Exception:
-                    continue
-
-            print(f"   Página {page}: +{len(results)} medições (total: {len(all_measurements)})")
-
-            if len(all_measurements) >= target_points:
-                break
-
-            page += 1
-
-            if page > 50:
-                print(f"   ⚠️  Limite de páginas atingido")
-                break
+    try:
+        async with contextlib.nullcontext(session) if session else create_session() as session:
+            ts_strs, vals = await fetch_records(
+                session,
+                api_key,
+                url,
+                params,
+                limit=10000,
+                target_points=target_points,
+                parameter_name=parameter_name,
+                semaphore=semaphore,
+                limiter=limiter,
+                label="medições",
+            )
 
-            time.sleep(0.5)
+        # Conversão vetorizada dos timestamps (uma chamada para todas as linhas)
+        ts = pd.to_datetime(ts_strs, utc=True, format="ISO8601")
 
-        # Criar DataFrame
-        df = pd.DataFrame(all_measurements)
+        df = finalize_frame(pd.DataFrame({"timestamp": ts, "value": vals}), "timestamp", target_points)
 
         if len(df) > 0:
-            df = df.sort_values("timestamp").reset_index(drop=True)
-
-            # Limitar ao número alvo
-            if len(df) > target_points:
-                df = df.tail(target_points).reset_index(drop=True)
-
             print(f"   ✅ Total extraído: {len(df)} pontos")
             print(f"   Período: {df['timestamp'].min()} a {df['timestamp'].max()}")
         else:
@@ -124,7 +100,9 @@ def extract_measurements_from_sensor(
         return pd.DataFrame(columns=["timestamp", "value"])
 
 
-def extract_1000_points_los_angeles(api_key: str, output_csv: str = "la_air_quality_1000points.csv") -> str:
+def extract_1000_points_los_angeles(
+    api_key: str, output_path: str = "la_air_quality_1000points.parquet", export_csv: bool = False
+) -> str:
     """
     Extrai 1000 pontos temporais de estações em Los Angeles
 
@@ -135,10 +113,11 @@ def extract_1000_points_los_angeles(api_key: str, output_csv: str = "la_air_qual
 
     Args:
         api_key: API key OpenAQ
-        output_csv: Caminho do CSV de saída
+        output_path: Caminho do Parquet de saída
+        export_csv: Também salvar uma cópia CSV (mesmo nome, extensão .csv)
 
     Returns:
-        Caminho do CSV gerado
+        Caminho do Parquet gerado
     """
     print("=" * 80)
     print("🌆 EXTRAÇÃO DE 1000 PONTOS - LOS ANGELES")
@@ -164,24 +143,21 @@ def extract_1000_points_los_angeles(api_key: str, output_csv: str = "la_air_qual
     print("📥 EXTRAINDO DADOS")
     print("=" * 80)
 
+    sensors = [(NO2_SENSOR, "no2", 10000), (O3_SENSOR, "o3", 10000)]
+    if HCHO_SENSOR:
+        sensors.append((HCHO_SENSOR, "hcho", 1000))
+
+    dfs = asyncio.run(extract_sensors(extract_measurements_from_sensor, api_key=api_key, sensors=sensors))
+
     # NO₂
-    df_no2 = extract_measurements_from_sensor(
-        api_key=api_key, sensor_id=NO2_SENSOR, parameter_name="no2", target_points=10000
-    )
-    df_no2 = df_no2.rename(columns={"value": "no2_ug_m3"})
+    df_no2 = dfs[0].rename(columns={"value": "no2_ug_m3"})
 
     # O₃
-    df_o3 = extract_measurements_from_sensor(
-        api_key=api_key, sensor_id=O3_SENSOR, parameter_name="o3", target_points=10000
-    )
-    df_o3 = df_o3.rename(columns={"value": "o3_ug_m3"})
+    df_o3 = dfs[1].rename(columns={"value": "o3_ug_m3"})
 
     # HCHO
     if HCHO_SENSOR:
-        df_hcho = extract_measurements_from_sensor(
-            api_key=api_key, sensor_id=HCHO_SENSOR, parameter_name="hcho", target_points=1000
-        )
-        df_hcho = df_hcho.rename(columns={"value": "hcho_ug_m3"})
+        df_hcho = dfs[2].rename(columns={"value": "hcho_ug_m3"})
     else:
         print(f"\n⚠️  HCHO: Sem estação disponível em Los Angeles (normal - raro)")
         df_hcho = pd.DataFrame(columns=["timestamp", "hcho_ug_m3"])
@@ -193,34 +169,21 @@ def extract_1000_points_los_angeles(api_key: str, output_csv: str = "la_air_qual
     print("🔗 COMBINANDO DADOS")
     print("=" * 80)
 
-    # Criar união de todos os timestamps
-    all_timestamps = set()
-
-    if len(df_no2) > 0:
-        all_timestamps.update(df_no2["timestamp"].tolist())
-    if len(df_o3) > 0:
-        all_timestamps.update(df_o3["timestamp"].tolist())
-    if len(df_hcho) > 0:
-        all_timestamps.update(df_hcho["timestamp"].tolist())
+    # União ordenada dos timestamps, feita em índices datetime64 (sem objetos Python)
+    indexes = [pd.Index(df["timestamp"]) for df in (df_no2, df_o3, df_hcho) if len(df) > 0]
+    all_timestamps = indexes[0] if indexes else pd.DatetimeIndex([], tz="UTC")
+    for index in indexes[1:]:
+        all_timestamps = all_timestamps.union(index)
 
     # Criar DataFrame base
-    df_combined = pd.DataFrame({"timestamp": sorted(list(all_timestamps))})
-
-    # Merge dados
-    if len(df_no2) > 0:
-        df_combined = df_combined.merge(df_no2, on="timestamp", how="left")
-    else:
-        df_combined["no2_ug_m3"] = np.nan
+    df_combined = pd.DataFrame({"timestamp": all_timestamps})
 
-    if len(df_o3) > 0:
-        df_combined = df_combined.merge(df_o3, on="timestamp", how="left")
-    else:
-        df_combined["o3_ug_m3"] = np.nan
-
-    if len(df_hcho) > 0:
-        df_combined = df_combined.merge(df_hcho, on="timestamp", how="left")
-    else:
-        df_combined["hcho_ug_m3"] = np.nan
+    # Mapear valores por timestamp (chave única por sensor; ausentes viram NaN)
+    for df, column in ((df_no2, "no2_ug_m3"), (df_o3, "o3_ug_m3"), (df_hcho, "hcho_ug_m3")):
+        if len(df) > 0:
+            df_combined[column] = df_combined["timestamp"].map(df.set_index("timestamp")[column])
+        else:
+            df_combined[column] = np.float32(np.nan)
 
     # Limitar a 10000 pontos (pegar os mais recentes)
     if len(df_combined) > 10000:
@@ -236,15 +199,22 @@ def extract_1000_points_los_angeles(api_key: str, output_csv: str = "la_air_qual
         print(f"   Período: {df_combined['timestamp'].min()} a {df_combined['timestamp'].max()}")
 
     # ========================================================================
-    # SALVAR CSV
+    # SALVAR PARQUET
     # ========================================================================
     print(f"\n{'=' * 80}")
-    print("💾 SALVANDO CSV")
+    print("💾 SALVANDO PARQUET")
     print("=" * 80)
 
-    df_combined.to_csv(output_csv, index=False)
+    # Binário + zstd: arquivo menor e leitura sem parsing, preservando os dtypes
+    df_combined.to_parquet(output_path, engine="pyarrow", compression="zstd", index=False)
+
+    print(f"\n✅ Parquet salvo: {output_path}")
+
+    if export_csv:
+        csv_path = os.path.splitext(output_path)[0] + ".csv"
+        df_combined.to_csv(csv_path, index=False)
+        print(f"✅ CSV salvo: {csv_path}")
 
-    print(f"\n✅ CSV salvo: {output_csv}")
     print(f"   Linhas: {len(df_combined)}")
     print(f"   Colunas: timestamp, no2_ug_m3, o3_ug_m3, hcho_ug_m3")
 
@@ -271,12 +241,12 @@ def extract_1000_points_los_angeles(api_key: str, output_csv: str = "la_air_qual
     print("✅ EXTRAÇÃO CONCLUÍDA!")
     print("=" * 80)
 
-    return output_csv
+    return output_path
 
 
 if __name__ == "__main__":
     # Executar
-    import os
+    import sys
 
     API_KEY = os.getenv("OPENAQ_API_KEY", "")
 
@@ -284,11 +254,14 @@ if __name__ == "__main__":
         print("❌ OPENAQ_API_KEY não configurada nas variáveis de ambiente")
         exit(1)
 
-    csv_path = extract_1000_points_los_angeles(api_key=API_KEY, output_csv="la_air_quality_1000points.csv")
+    # --csv: também exporta o CSV legado
+    output_path = extract_1000_points_los_angeles(
+        api_key=API_KEY, output_path="la_air_quality_1000points.parquet", export_csv="--csv" in sys.argv
+    )
 
-    print(f"\n📁 Arquivo gerado: {csv_path}")
+    print(f"\n📁 Arquivo gerado: {output_path}")
 
     # Mostrar primeiras linhas
     print(f"\n📋 PREVIEW:")
-    df = pd.read_csv(csv_path)
+    df = pd.read_parquet(output_path)
     print(df.head(10))
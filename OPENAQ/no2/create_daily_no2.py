@@ -13,28 +13,30 @@ def create_daily_no2():
     """
 
     # Arquivo de entrada (dados horários)
-    hourly_file = "extract_1000_daily_la.py"
+    hourly_file = "MODELS/OPENAQ/no2/HOURS/la_no2_1000points.csv"
 
     if not os.path.exists(hourly_file):
         print(f"❌ Arquivo não encontrado: {hourly_file}")
         return
 
     print(f"📖 Lendo dados horários: {hourly_file}")
-    df = pd.read_csv(hourly_file, parse_dates=["timestamp"])
+    df = pd.read_csv(hourly_file, parse_dates=["timestamp"], dtype={"no2_ug_m3": "float32"})
 
     print(f"   ✅ {len(df)} pontos horários carregados")
     print(f"   📅 Período: {df['timestamp'].min()} → {df['timestamp'].max()}")
 
-    # Agrupar por data e calcular médias diárias
-    df["date"] = df["timestamp"].dt.date
-    daily_df = df.groupby("date").agg({"no2_ug_m3": "mean"}).reset_index()
-
-    # Criar timestamp à meia-noite para cada dia
-    daily_df["timestamp"] = pd.to_datetime(daily_df["date"])
-    daily_df = daily_df[["timestamp", "no2_ug_m3"]].copy()
-
-    # Arredondar para 3 casas decimais
-    daily_df["no2_ug_m3"] = daily_df["no2_ug_m3"].round(3)
+    # Médias diárias via resample no índice temporal (arredondadas para 3 casas)
+    daily_df = (
+        df.set_index("timestamp")["no2_ug_m3"]
+        .resample("D")
+        .mean()
+        .dropna()  # dias sem nenhuma medição válida
+        .round(3)
+        .reset_index()
+    )
+
+    # Timestamp à meia-noite de cada dia, sem fuso
+    daily_df["timestamp"] = daily_df["timestamp"].dt.tz_localize(None)
 
     # Salvar dados diários
     output_file = "MODELS/OPENAQ/no2/DAYS/la_no2_daily.csv"
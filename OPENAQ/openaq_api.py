@@ -0,0 +1,356 @@
+"""
+Cliente assíncrono da API OpenAQ v3
+Paginação concorrente com limite por host, rate limit e retry
+"""
+
+import asyncio
+import functools
+import math
+import os
+import time
+
+import aiohttp
+import diskcache
+import numpy as np
+import orjson
+import pandas as pd
+
+OPENAQ_BASE_URL = "https://api.openaq.org/v3"
+
+# Fatores ppm -> μg/m³ por parâmetro
+PPM_TO_UG_M3 = {
+    "no2": 1880.0,  # NO₂: 1 ppm = 1880 μg/m³
+    "o3": 1960.0,  # O₃: 1 ppm = 1960 μg/m³
+    "hcho": 1230.0,  # HCHO: 1 ppm = 1230 μg/m³
+}
+
+# Requisições simultâneas ao host da API (somando todos os sensores)
+MAX_CONCURRENCY = 8
+
+# Pool de conexões da sessão compartilhada
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+# Limite de páginas por sensor
+MAX_PAGES = 50
+
+# Tentativas em 429/5xx (backoff exponencial: 1s, 2s, 4s, ...)
+MAX_RETRIES = 5
+
+# Cache em disco das páginas já baixadas (validade de 1 dia)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".openaq_cache")
+CACHE_TTL = 86400
+
+
+class RateLimiter:
+    """
+    Token bucket alimentado pelos headers x-ratelimit-* da OpenAQ
+
+    Só espera quando o bucket está perto de esvaziar, aguardando até o reset
+    informado pelo servidor.
+    """
+
+    def __init__(self, min_remaining: int = 1):
+        self.min_remaining = min_remaining
+        self.remaining = None
+        self.reset_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def update(self, headers) -> None:
+        """Atualiza o bucket com os headers da última resposta"""
+        remaining = headers.get("x-ratelimit-remaining")
+        reset = headers.get("x-ratelimit-reset")
+
+        if remaining is None or reset is None:
+            return
+
+        try:
+            self.remaining = int(remaining)
+            # x-ratelimit-reset: segundos até o reset da janela
+            self.reset_at = time.monotonic() + float(reset)
+        except ValueError:
+            pass
+
+    async def acquire(self) -> None:
+        """Consome um token, dormindo até o reset se o bucket estiver vazio"""
+        async with self._lock:
+            if self.remaining is None:
+                return
+
+            if self.remaining <= self.min_remaining:
+                delay = self.reset_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Janela nova: o próximo header volta a informar o saldo
+                self.remaining = None
+            else:
+                self.remaining -= 1
+
+
+@functools.lru_cache(maxsize=None)
+def get_cache() -> diskcache.Cache:
+    """Abre (uma vez por processo) o cache em disco das respostas da API"""
+    return diskcache.Cache(CACHE_DIR)
+
+
+def create_session() -> aiohttp.ClientSession:
+    """
+    Cria a sessão HTTP compartilhada pelos extratores
+
+    A API key vai por requisição (fetch_page), então uma única sessão, e o
+    pool de conexões TLS já abertas, serve todos os sensores de uma execução.
+
+    Returns:
+        aiohttp.ClientSession com keep-alive e limites de conexões
+    """
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONNECTIONS, limit_per_host=MAX_KEEPALIVE_CONNECTIONS, keepalive_timeout=60
+    )
+
+    return aiohttp.ClientSession(
+        headers={"Accept": "application/json"},
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=30),
+    )
+
+
+async def fetch_page(
+    session: aiohttp.ClientSession,
+    api_key: str,
+    url: str,
+    params: dict,
+    semaphore: asyncio.Semaphore,
+    limiter: RateLimiter,
+) -> dict:
+    """
+    Busca uma página da API com retry exponencial em 429/5xx
+
+    Respostas ficam no cache em disco por CACHE_TTL, com chave URL + params
+    (a API key não entra na chave); reexecuções no mesmo dia não vão à rede.
+
+    Args:
+        session: Sessão HTTP
+        api_key: API key OpenAQ
+        url: URL do endpoint
+        params: Parâmetros da query (inclui page)
+        semaphore: Limita requisições simultâneas
+        limiter: Rate limiter compartilhado entre as páginas
+
+    Returns:
+        JSON decodificado da resposta
+    """
+    cache = get_cache()
+    key = (url, tuple(sorted(params.items())))
+
+    body = cache.get(key)
+    if body is not None:
+        return orjson.loads(body)
+
+    for attempt in range(MAX_RETRIES):
+        await limiter.acquire()
+
+        async with semaphore, session.get(url, params=params, headers={"X-API-Key": api_key}) as response:
+            limiter.update(response.headers)
+
+            if response.status != 429 and response.status < 500:
+                response.raise_for_status()
+                body = await response.read()
+                cache.set(key, body, expire=CACHE_TTL)
+                return orjson.loads(body)
+
+            if attempt == MAX_RETRIES - 1:
+                response.raise_for_status()
+
+        await asyncio.sleep(2**attempt)
+
+
+async def fetch_records(
+    session: aiohttp.ClientSession,
+    api_key: str,
+    url: str,
+    params: dict,
+    limit: int,
+    target_points: int,
+    parameter_name: str,
+    semaphore: asyncio.Semaphore,
+    limiter: RateLimiter,
+    label: str = "registros",
+) -> tuple:
+    """
+    Pagina um endpoint de sensor até o número alvo de registros
+
+    A primeira página informa o total (meta.found) e o tamanho real das
+    páginas; as que faltam para o alvo são buscadas em paralelo, mais
+    recentes primeiro.
+
+    Args:
+        session: Sessão HTTP
+        api_key: API key OpenAQ
+        url: URL do endpoint
+        params: Parâmetros da query (janela de datas)
+        limit: Registros por página pedidos (a API pode devolver menos)
+        target_points: Número alvo de registros
+        parameter_name: Nome do parâmetro (no2, o3, hcho), define o fator ppm
+        semaphore: Limita requisições simultâneas
+        limiter: Rate limiter da API key
+        label: Nome dos registros nas mensagens de progresso
+
+    Returns:
+        (timestamps UTC em texto, valores em μg/m³ como float32)
+    """
+    params = {
+        **params,
+        "limit": limit,
+        # Mais recentes primeiro: as primeiras páginas já cobrem o alvo
+        "sort_order": "desc",
+    }
+    ppm_factor = PPM_TO_UG_M3.get(parameter_name.lower(), 1.0)
+
+    # Colunas preenchidas em paralelo; o DataFrame é montado uma vez no final
+    ts_strs = []
+    val_chunks = []  # um array por página, já em μg/m³
+    page = 1
+
+    def get_page(page_number: int):
+        return fetch_page(session, api_key, url, {**params, "page": page_number}, semaphore, limiter)
+
+    # Primeira página: descobre o total (meta.found) para planejar as demais
+    batch = [await get_page(1)]
+    meta = batch[0].get("meta", {})
+    found = meta.get("found")
+
+    # Tamanho real da página: a API pode limitar abaixo do limit pedido (v3: máx. 1000)
+    page_size = len(batch[0].get("results", [])) or limit
+    if isinstance(meta.get("limit"), int) and meta["limit"] > 0:
+        page_size = min(page_size, meta["limit"])
+
+    last_page = MAX_PAGES
+    if isinstance(found, int):
+        last_page = min(last_page, max(math.ceil(found / page_size), 1))
+
+    while True:
+        for data in batch:
+            results = data.get("results", [])
+
+            if not results:
+                print(f"   Sem mais dados (página {page})")
+                break
+
+            # Mesma unidade para todo o sensor: fator de conversão lido uma vez por página,
+            # do primeiro registro que informa a unidade
+            unit = next(
+                (r["parameter"]["units"] for r in results if (r.get("parameter") or {}).get("units")),
+                "unknown",
+            )
+            factor = ppm_factor if unit.lower() == "ppm" else 1.0
+
+            # Processar resultados em colunas da página, anexadas de uma vez no final
+            page_ts = []
+            page_vals = []
+            for record in results:
+                # Acesso direto (sem .get encadeado); registro incompleto é descartado
+                try:
+                    # Timestamp está em period.datetimeFrom.utc
+                    timestamp_str = record["period"]["datetimeFrom"]["utc"]
+                    value = record["value"]
+                except (KeyError, TypeError):
+                    continue
+
+                if not timestamp_str or value is None:
+                    continue
+
+                page_ts.append(timestamp_str)
+                page_vals.append(value)
+
+            # Converter para μg/m³ com um único escalar para a página
+            ts_strs.extend(page_ts)
+            val_chunks.append(np.asarray(page_vals, dtype=np.float64) * factor)
+
+            print(f"   Página {page}: +{len(results)} {label} (total: {len(ts_strs)})")
+            page += 1
+
+            # Alvo atingido: o restante da leva não é processado
+            if len(ts_strs) >= target_points:
+                break
+        else:
+            missing = target_points - len(ts_strs)
+
+            if missing > 0 and page <= last_page:
+                # Próxima leva: só as páginas que faltam para o alvo, em paralelo
+                wave = range(page, min(page + math.ceil(missing / page_size), last_page + 1))
+                batch = await asyncio.gather(*(get_page(p) for p in wave))
+                continue
+
+            if missing > 0 and page > MAX_PAGES:
+                print(f"   ⚠️  Limite de páginas atingido")
+
+        break
+
+    # float32 basta para a precisão dos sensores (metade da memória e do I/O)
+    vals = np.concatenate(val_chunks) if val_chunks else np.empty(0)
+
+    return ts_strs, vals.astype(np.float32)
+
+
+def finalize_frame(df: pd.DataFrame, key: str, target_points: int) -> pd.DataFrame:
+    """
+    Deduplica, ordena e corta o DataFrame de um sensor
+
+    Args:
+        df: DataFrame com a coluna de tempo (key) e value
+        key: Nome da coluna de tempo (date ou timestamp)
+        target_points: Número alvo de pontos
+
+    Returns:
+        DataFrame ordenado com os target_points mais recentes
+    """
+    if len(df) == 0:
+        return df
+
+    # Uma linha por chave: páginas sobrepostas não podem duplicar a chave do join
+    df = df.drop_duplicates(key, keep="last")
+    df = df.sort_values(key).reset_index(drop=True)
+
+    # Limitar ao número alvo (os mais recentes). O corte fica aqui, e não num
+    # deque(maxlen): as páginas chegam das mais novas para as mais antigas e a
+    # deduplicação precisa vir antes do corte
+    if len(df) > target_points:
+        df = df.tail(target_points).reset_index(drop=True)
+
+    return df
+
+
+async def extract_sensors(extract, api_key: str, sensors: list) -> list:
+    """
+    Extrai vários sensores em paralelo, com uma única sessão HTTP,
+    semáforo e rate limiter
+
+    Args:
+        extract: Extrator de um sensor (coroutine function do script)
+        api_key: API key OpenAQ
+        sensors: Lista de (sensor_id, parameter_name, target_points)
+
+    Returns:
+        Lista de DataFrames, na mesma ordem de sensors
+    """
+    # Concorrência e saldo do rate limit valem para a API key, não por sensor:
+    # um único semáforo e um único limiter para todas as extrações
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    limiter = RateLimiter()
+
+    # Sensores são endpoints independentes: extraídos em paralelo
+    async with create_session() as session:
+        return await asyncio.gather(
+            *(
+                extract(
+                    api_key=api_key,
+                    sensor_id=sensor_id,
+                    parameter_name=parameter_name,
+                    target_points=target_points,
+                    session=session,
+                    semaphore=semaphore,
+                    limiter=limiter,
+                )
+                for sensor_id, parameter_name, target_points in sensors
+            )
+        )
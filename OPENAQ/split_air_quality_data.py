@@ -1,30 +1,49 @@
 """
 Split LA Air Quality Data into Separate Pollutant Files
-Separa o arquivo la_air_quality_1000points.csv em arquivos individuais por poluente
+Separa o arquivo la_air_quality_1000points (Parquet ou CSV) em arquivos individuais por poluente
 """
 
 import pandas as pd
 import os
 
 
+def read_columns(input_file: str, columns: list) -> pd.DataFrame:
+    """
+    Lê apenas as colunas pedidas do arquivo de entrada
+
+    Args:
+        input_file: Caminho do Parquet ou CSV
+        columns: Colunas a carregar
+
+    Returns:
+        DataFrame só com as colunas pedidas (poluentes em float32)
+    """
+    dtype = {column: "float32" for column in columns if column != "timestamp"}
+
+    if input_file.endswith(".parquet"):
+        return pd.read_parquet(input_file, columns=columns).astype(dtype)
+
+    # Leitor CSV multithread do Arrow
+    return pd.read_csv(input_file, usecols=columns, dtype=dtype, engine="pyarrow")
+
+
 def split_air_quality_data():
     """
     Separa o arquivo principal de qualidade do ar em arquivos individuais
     por poluente (NO2 e O3)
     """
 
-    # Arquivo de entrada
-    input_file = "la_air_quality_1000points.csv"
+    # Arquivo de entrada (Parquet do extrator; CSV legado como fallback)
+    input_file = "la_air_quality_1000points.parquet"
+    if not os.path.exists(input_file):
+        input_file = "la_air_quality_1000points.csv"
 
     if not os.path.exists(input_file):
         print(f"❌ Arquivo não encontrado: {input_file}")
         return
 
-    # Ler o arquivo original
+    # Cada poluente lê só as próprias colunas do arquivo original
     print(f"📖 Lendo arquivo: {input_file}")
-    df = pd.read_csv(input_file)
-    print(f"   ✅ {len(df)} linhas carregadas")
-    print(f"   📊 Colunas: {list(df.columns)}")
 
     # Criar diretórios se não existirem
     os.makedirs("no2", exist_ok=True)
@@ -32,7 +51,7 @@ def split_air_quality_data():
 
     # Criar dataset NO2
     print(f"\n🔬 Criando arquivo NO2...")
-    no2_df = df[["timestamp", "no2_ug_m3"]].copy()
+    no2_df = read_columns(input_file, ["timestamp", "no2_ug_m3"])
     no2_output = "no2/la_no2_1000points.csv"
     no2_df.to_csv(no2_output, index=False)
     print(f"   ✅ Criado: {no2_output} ({len(no2_df)} linhas)")
@@ -41,7 +60,7 @@ def split_air_quality_data():
 
     # Criar dataset O3
     print(f"\n🌍 Criando arquivo O3...")
-    o3_df = df[["timestamp", "o3_ug_m3"]].copy()
+    o3_df = read_columns(input_file, ["timestamp", "o3_ug_m3"])
     o3_output = "o3/la_o3_1000points.csv"
     o3_df.to_csv(o3_output, index=False)
     print(f"   ✅ Criado: {o3_output} ({len(o3_df)} linhas)")